@@ -0,0 +1,730 @@
+"""Offline benchmark / load test for bot.py.
+
+Drives the real handlers (search_music, download_callback, start,
+verify_command, pasted video and playlist links) with no network access:
+
+- yt-dlp is replaced by a fake extractor serving local audio fixtures
+- MongoDB is mongomock's in-memory stand-in
+- the Telegram Bot API and the URL shortener are a local aiohttp server
+
+Needs the dev requirements (pip install -r requirements-dev.txt).
+
+Usage:
+    python bench.py --updates 500 --concurrency 20
+    python bench.py --mix search=1 --updates 200 --concurrency 50
+    python bench.py --mode native --fixture-dir ./fixtures
+    python bench.py --mix playlist=1 --updates 20 --playlist-size 25
+    python bench.py --ydl-setup 200
+    python bench.py --shortener-check
+    python bench.py --compare-modes --updates 40 --track-seconds 180
+
+Reports updates/sec, p50/p99 handler latency per update type and
+event-loop stall time.
+"""
+import os
+import time
+import json
+import random
+import shutil
+import asyncio
+import argparse
+import subprocess
+import tempfile
+import itertools
+import importlib.util
+
+BENCH_PORT = int(os.environ.get("BENCH_PORT", "18443"))
+BENCH_TOKEN = "123456:BENCH"
+
+os.environ.setdefault("MONGODB_URI", "mongomock://")
+os.environ.setdefault("BOT_TOKEN", BENCH_TOKEN)
+os.environ.setdefault("SHORTENER_DOMAIN", f"http://127.0.0.1:{BENCH_PORT}/shorten")
+os.environ.setdefault("VERIFY_POOL_SIZE", "0")
+os.environ.setdefault("LOG_FILE", os.path.join(tempfile.gettempdir(), "musicbot_bench.log"))
+
+from aiohttp import web
+from telegram import Update
+
+import bot
+
+
+# Audio fixtures
+def write_silent_mp3(path, frames=200):
+    """MPEG-1 Layer III, 128kbps, 44.1kHz frames of silence (about 5s)."""
+    header = bytes([0xFF, 0xFB, 0x90, 0x00])
+    frame = header + bytes(417 - len(header))
+    with open(path, 'wb') as f:
+        f.write(frame * frames)
+
+
+def write_thumbnail(path):
+    from PIL import Image
+    Image.new('RGB', (1280, 720), (30, 30, 60)).save(path, 'JPEG', quality=95)
+
+
+def prepare_fixtures(fixture_dir, track_seconds=5):
+    """Use fixtures from fixture_dir if given, else synthesize them."""
+    work_dir = tempfile.mkdtemp(prefix="musicbot_bench_")
+    fixtures = {}
+    for ext in ('mp3', 'm4a', 'jpg'):
+        source = os.path.join(fixture_dir, f"track.{ext}") if fixture_dir else None
+        target = os.path.join(work_dir, f"track.{ext}")
+        if source and os.path.exists(source):
+            shutil.copy(source, target)
+        elif ext == 'mp3':
+            write_silent_mp3(target)
+        elif ext == 'jpg':
+            write_thumbnail(target)
+        elif shutil.which('ffmpeg'):
+            os.system(f"ffmpeg -loglevel error -f lavfi -i sine=frequency=440:duration={track_seconds} "
+                      f"-c:a aac -b:a 128k {target}")
+        else:
+            # No ffmpeg: the m4a is not a real MP4, so tagging logs a warning.
+            shutil.copy(fixtures['mp3'], target)
+        fixtures[ext] = target
+    return fixtures
+
+
+# Fake yt-dlp
+def result_video_id(query, rank):
+    return f"vid{abs(hash((query, rank))) % 10 ** 8:08d}"
+
+
+class FakeYoutubeDL:
+    """Stand-in for yt_dlp.YoutubeDL with configurable simulated latency."""
+
+    fixtures = {}
+    search_delay = 0.2
+    extract_delay = 0.2
+    download_delay = 0.5
+    playlist_size = 12
+    ffmpeg = None  # path: post-process the m4a fixture with the real FFmpeg instead of copying
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def close(self):
+        pass
+
+    def extract_info(self, url, download=False, **kwargs):
+        if url.startswith("ytsearch"):
+            prefix, query = url.split(":", 1)
+            limit = int(prefix[len("ytsearch"):] or 1)
+            time.sleep(self.search_delay)
+            return {'entries': [
+                {
+                    'id': result_video_id(query, i),
+                    'title': f"{query} #{i}",
+                    'duration': 180 + i,
+                    'channel': "Bench"
+                }
+                for i in range(limit)
+            ]}
+
+        if "playlist?list=" in url:
+            playlist_id = url.rsplit("list=", 1)[-1]
+            time.sleep(self.search_delay)
+            return {'title': f"Playlist {playlist_id}", 'entries': [
+                {'id': f"vid{abs(hash((playlist_id, i))) % 10 ** 8:08d}", 'title': f"{playlist_id} #{i}"}
+                for i in range(self.playlist_size)
+            ]}
+
+        video_id = url.rsplit("v=", 1)[-1]
+        time.sleep(self.extract_delay)
+        info = {'id': video_id, 'title': f"Track {video_id}", 'uploader': "Bench"}
+        if not download:
+            return info
+        return self.process_ie_result(info, download=True)
+
+    def sanitize_info(self, info):
+        return dict(info)
+
+    def process_ie_result(self, info, download=True):
+        """Download an already extracted video, reporting progress like yt-dlp."""
+        progress_hooks = self.params.get('progress_hooks', [])
+        for step in range(5):
+            for hook in progress_hooks:
+                hook({'status': 'downloading', 'downloaded_bytes': step, 'total_bytes': 5})
+            time.sleep(self.download_delay / 5)
+        for hook in progress_hooks:
+            hook({'status': 'finished', 'downloaded_bytes': 5, 'total_bytes': 5})
+
+        outtmpl = self.params['outtmpl']
+        outtmpl = outtmpl.get('default') if isinstance(outtmpl, dict) else outtmpl
+        codec = self.params['postprocessors'][0].get('preferredcodec', 'mp3')
+        ext = 'mp3' if codec == 'mp3' else 'm4a'
+
+        hooks = self.params.get('postprocessor_hooks', [])
+        for hook in hooks:
+            hook({'status': 'started', 'postprocessor': 'ExtractAudio'})
+        if self.ffmpeg:
+            self.extract_audio(self.params['postprocessors'][0], f"{outtmpl}.{ext}")
+        else:
+            shutil.copy(self.fixtures[ext], f"{outtmpl}.{ext}")
+        for hook in hooks:
+            hook({'status': 'finished', 'postprocessor': 'ExtractAudio'})
+
+        if self.params.get('writethumbnail'):
+            shutil.copy(self.fixtures['jpg'], f"{outtmpl}.jpg")
+        return info
+
+    def extract_audio(self, postprocessor, target):
+        """What FFmpegExtractAudio does with a downloaded AAC stream: remux to m4a or transcode to mp3."""
+        if postprocessor['preferredcodec'] == 'mp3':
+            codec_args = ['-c:a', 'libmp3lame', '-b:a', f"{postprocessor.get('preferredquality', '192')}k"]
+        else:
+            codec_args = ['-c:a', 'copy']
+        subprocess.run(
+            [self.ffmpeg, '-loglevel', 'error', '-y', '-i', self.fixtures['m4a'], '-vn', *codec_args, target],
+            check=True
+        )
+
+
+# Fake Bot API + shortener
+class FakeTelegram:
+    def __init__(self):
+        self.message_ids = itertools.count(1000)
+        self.file_ids = itertools.count(1)
+        self.calls = {}
+
+    def message(self, chat_id, **extra):
+        result = {
+            'message_id': next(self.message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'}
+        }
+        result.update(extra)
+        return result
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        self.calls[method] = self.calls.get(method, 0) + 1
+        data = await request.post()
+        chat_id = data.get('chat_id', 0)
+
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': "Bench", 'username': "bench_bot"}
+        elif method == 'getChatMember':
+            user_id = int(data.get('user_id', 0))
+            result = {'status': 'member', 'user': {'id': user_id, 'is_bot': False, 'first_name': "u"}}
+        elif method == 'sendAudio':
+            file_id = f"AUDIO{next(self.file_ids)}"
+            result = self.message(chat_id, audio={
+                'file_id': file_id,
+                'file_unique_id': file_id,
+                'duration': 5
+            })
+        elif method == 'sendMediaGroup':
+            result = []
+            for _ in json.loads(data.get('media', '[]')):
+                file_id = f"AUDIO{next(self.file_ids)}"
+                result.append(self.message(chat_id, audio={
+                    'file_id': file_id,
+                    'file_unique_id': file_id,
+                    'duration': 5
+                }))
+        elif method in ('sendMessage', 'sendPhoto', 'sendSticker', 'editMessageText'):
+            result = self.message(chat_id, text=data.get('text', ''))
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+    async def shorten(self, request):
+        return web.Response(text=f"http://short.local/{random.getrandbits(32):08x}")
+
+    def app(self):
+        app = web.Application(client_max_size=100 * 1024 * 1024)
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        app.router.add_get('/shorten', self.shorten)
+        return app
+
+
+# Updates
+UPDATE_IDS = itertools.count(1)
+
+
+def user_dict(user_id):
+    return {'id': user_id, 'is_bot': False, 'first_name': f"user{user_id}", 'username': f"user{user_id}"}
+
+
+def message_dict(user_id, text):
+    message = {
+        'message_id': next(UPDATE_IDS),
+        'date': int(time.time()),
+        'chat': {'id': user_id, 'type': 'private'},
+        'from': user_dict(user_id),
+        'text': text
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return message
+
+
+def clicked_video_id(args):
+    """Mostly one of the top three results of a bench query, like real users pick."""
+    if random.random() < args.top_click_share:
+        return result_video_id(f"song {random.randrange(args.queries)}", random.randrange(3))
+    return f"vid{random.randrange(args.videos):08d}"
+
+
+def make_update(kind, user_id, args, application):
+    if kind == 'download':
+        data = {
+            'update_id': next(UPDATE_IDS),
+            'callback_query': {
+                'id': str(next(UPDATE_IDS)),
+                'from': user_dict(user_id),
+                'chat_instance': str(user_id),
+                'message': message_dict(user_id, "results"),
+                'data': f"dl_{clicked_video_id(args)}"
+            }
+        }
+    else:
+        text = {
+            'search': f"song {random.randrange(args.queries)}",
+            'start': "/start",
+            'verify': "/verify",
+            'playlist': f"https://www.youtube.com/playlist?list=PLbench{random.randrange(5)}",
+            'link': f"https://youtu.be/vid{random.randrange(args.videos):08d}?t=30",
+        }[kind]
+        data = {'update_id': next(UPDATE_IDS), 'message': message_dict(user_id, text)}
+    return Update.de_json(data, application.bot)
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(','):
+        kind, _, weight = part.partition('=')
+        weights[kind.strip()] = float(weight or 1)
+    return weights
+
+
+# Measurement
+class LoopMonitor:
+    """Measures how late the event loop wakes up from short sleeps."""
+
+    def __init__(self, interval=0.01, stall_threshold=0.05):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - started - self.interval))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def report(self):
+        stalls = [lag for lag in self.lags if lag >= self.stall_threshold]
+        return {
+            'max_lag_ms': round(max(self.lags, default=0) * 1000, 1),
+            'p99_lag_ms': round(percentile(self.lags, 99) * 1000, 1),
+            'stalls': len(stalls),
+            'stall_seconds': round(sum(stalls), 3)
+        }
+
+
+def measure_ydl_setup(rounds):
+    """Per-request YoutubeDL setup cost: a fresh instance per call vs the pool.
+
+    Uses the real yt_dlp (no network), so it runs before the fake is patched in.
+    """
+    results = {}
+    for profile, factory in bot.YdlPool.PROFILES.items():
+        # The first construction loads the extractor registry; keep it out of both numbers
+        bot.yt_dlp.YoutubeDL(factory()).close()
+
+        started = time.perf_counter()
+        for _ in range(rounds):
+            with bot.yt_dlp.YoutubeDL(factory()):
+                pass
+        fresh = time.perf_counter() - started
+
+        pool = bot.YdlPool(1)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            with pool.acquire(profile):
+                pass
+        pooled = time.perf_counter() - started
+        pool.close()
+
+        results[profile] = {
+            'fresh_ms': round(fresh / rounds * 1000, 3),
+            'pooled_ms': round(pooled / rounds * 1000, 3)
+        }
+    return results
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+# Shortener retry / circuit-breaker checks
+class ScriptedShortener:
+    """Fake shortener answering each request from a script of status codes.
+
+    'ok' answers with a short URL, 'slow' sleeps past the client timeout,
+    any other entry is an HTTP status. The last entry repeats.
+    """
+
+    def __init__(self):
+        self.script = ['ok']
+        self.requests = 0
+        self.request_times = []
+
+    def reset(self, *script):
+        self.script = list(script)
+        self.requests = 0
+        self.request_times = []
+
+    async def handle(self, request):
+        step = self.script[min(self.requests, len(self.script) - 1)]
+        self.requests += 1
+        self.request_times.append(time.perf_counter())
+        if step == 'slow':
+            await asyncio.sleep(1)
+            step = 'ok'
+        if step == 'ok':
+            return web.Response(text=f"http://short.local/{self.requests}")
+        return web.Response(status=step, text="error")
+
+
+async def check_shortener():
+    """Retry/backoff and circuit-breaker behaviour against ScriptedShortener. Returns failures."""
+    fake = ScriptedShortener()
+    app = web.Application()
+    app.router.add_get('/check', fake.handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', BENCH_PORT).start()
+
+    results = []
+
+    def check(name, ok, detail=""):
+        results.append((name, ok, detail))
+
+    def client(retries=2, threshold=2, reset=0.3):
+        shortener = bot.ShortenerClient(f"http://127.0.0.1:{BENCH_PORT}/check", "key", 0.2, retries, 0.05)
+        shortener.breaker = bot.CircuitBreaker(threshold, reset)
+        return shortener
+
+    clients = []
+    try:
+        # Retries 5xx/429 with exponential backoff, then succeeds
+        shortener = client()
+        clients.append(shortener)
+        fake.reset(500, 429, 'ok')
+        url = await shortener.shorten("https://t.me/x")
+        gaps = [b - a for a, b in zip(fake.request_times, fake.request_times[1:])]
+        check("retry 5xx/429 then succeed", url is not None and fake.requests == 3, f"{fake.requests} requests")
+        check("exponential backoff", len(gaps) == 2 and gaps[0] >= 0.05 and gaps[1] >= 0.1,
+              ", ".join(f"{gap * 1000:.0f}ms" for gap in gaps))
+        check("success keeps breaker closed", shortener.breaker.state == "closed")
+
+        # Client errors are not retried
+        fake.reset(400)
+        url = await shortener.shorten("https://t.me/x")
+        check("4xx is not retried", url is None and fake.requests == 1, f"{fake.requests} requests")
+
+        # Timeouts are retried like 5xx
+        shortener = client(retries=1, threshold=5)
+        clients.append(shortener)
+        fake.reset('slow')
+        url = await shortener.shorten("https://t.me/x")
+        check("timeouts are retried", url is None and fake.requests == 2, f"{fake.requests} requests")
+
+        # Breaker opens after threshold failures and stops calling the shortener
+        shortener = client(retries=0)
+        clients.append(shortener)
+        fake.reset(500)
+        await shortener.shorten("https://t.me/x")
+        await shortener.shorten("https://t.me/x")
+        check("breaker opens at threshold", shortener.breaker.state == "open")
+        requests = fake.requests
+        url = await shortener.shorten("https://t.me/x")
+        check("open breaker short-circuits", url is None and fake.requests == requests)
+
+        # Half-open lets one trial through; a failed trial re-opens
+        await asyncio.sleep(0.35)
+        check("breaker half-opens after reset", shortener.breaker.state == "half-open")
+        fake.reset(500)
+        await shortener.shorten("https://t.me/x")
+        check("failed trial re-opens", shortener.breaker.state == "open" and fake.requests == 1)
+
+        # A cancelled trial counts as a failure instead of blocking trials forever
+        await asyncio.sleep(0.35)
+        fake.reset('slow')
+        shortener.timeout = 5
+        await shortener.close()
+        trial = asyncio.create_task(shortener.shorten("https://t.me/x"))
+        while not fake.requests:
+            await asyncio.sleep(0.01)
+        second = await shortener.shorten("https://t.me/x")
+        check("one trial at a time", second is None and fake.requests == 1,
+              f"{fake.requests} requests, state {shortener.breaker.state}")
+        trial.cancel()
+        try:
+            await trial
+        except asyncio.CancelledError:
+            pass
+        check("cancelled trial re-opens", shortener.breaker.state == "open" and not shortener.breaker._trial_running,
+              f"state {shortener.breaker.state}")
+
+        # A successful trial closes the breaker
+        await asyncio.sleep(0.35)
+        fake.reset('ok')
+        url = await shortener.shorten("https://t.me/x")
+        check("successful trial closes", url is not None and shortener.breaker.state == "closed")
+    finally:
+        for shortener in clients:
+            await shortener.close()
+        await runner.cleanup()
+
+    return results
+
+
+def delivery_report():
+    """bot.DELIVERY_STATS as per-track CPU seconds; FFmpeg CPU only counts downloads that ran alone."""
+    report = {}
+    for mode, stats in bot.DELIVERY_STATS.items():
+        python_cpu = stats['cpu_seconds'] / stats['tracks'] if stats['tracks'] else None
+        ffmpeg_cpu = stats['child_cpu_seconds'] / stats['child_tracks'] if stats['child_tracks'] else None
+        report[mode] = {
+            'tracks': stats['tracks'],
+            'ffmpeg_tracks': stats['child_tracks'],
+            'python_cpu_s': round(python_cpu, 4) if python_cpu is not None else None,
+            'ffmpeg_cpu_s': round(ffmpeg_cpu, 4) if ffmpeg_cpu is not None else None,
+            'cpu_s_per_track': round((python_cpu or 0) + (ffmpeg_cpu or 0), 4) if python_cpu is not None else None
+        }
+    return report
+
+
+async def run_benchmark(args):
+    fixtures = prepare_fixtures(args.fixture_dir, args.track_seconds)
+    FakeYoutubeDL.fixtures = fixtures
+    FakeYoutubeDL.search_delay = args.search_delay
+    FakeYoutubeDL.extract_delay = args.extract_delay
+    FakeYoutubeDL.download_delay = args.download_delay
+    FakeYoutubeDL.playlist_size = args.playlist_size
+    bot.yt_dlp.YoutubeDL = FakeYoutubeDL
+
+    fake = FakeTelegram()
+    runner = web.AppRunner(fake.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', BENCH_PORT).start()
+
+    application = bot.build_application(base_url=f"http://127.0.0.1:{BENCH_PORT}/bot")
+    weights = parse_mix(args.mix)
+    kinds = list(weights)
+    latencies = {kind: [] for kind in kinds}
+    errors = {kind: 0 for kind in kinds}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    monitor = LoopMonitor()
+
+    async def drive(kind):
+        update = make_update(kind, random.randrange(1, args.users + 1), args, application)
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await application.process_update(update)
+            except Exception:
+                errors[kind] += 1
+            latencies[kind].append(time.perf_counter() - started)
+
+    try:
+        async with application:
+            await bot.warm_up_mongo()
+            plan = random.choices(kinds, weights=[weights[k] for k in kinds], k=args.updates)
+            monitor.start()
+            started = time.perf_counter()
+            await asyncio.gather(*(drive(kind) for kind in plan))
+            elapsed = time.perf_counter() - started
+            await monitor.stop()
+            # Speculative downloads still read the fixtures
+            await bot.prefetcher.stop()
+            while bot.search_pool.active or bot.download_pool.active:
+                await asyncio.sleep(0.05)
+    finally:
+        await runner.cleanup()
+        shutil.rmtree(os.path.dirname(fixtures['mp3']), ignore_errors=True)
+
+    report = {
+        'updates': args.updates,
+        'concurrency': args.concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'updates_per_s': round(args.updates / elapsed, 1),
+        'handlers': {
+            kind: {
+                'count': len(values),
+                'errors': errors[kind],
+                'p50_ms': round(percentile(values, 50) * 1000, 1),
+                'p99_ms': round(percentile(values, 99) * 1000, 1),
+                'max_ms': round(max(values, default=0) * 1000, 1)
+            }
+            for kind, values in latencies.items()
+        },
+        'event_loop': monitor.report(),
+        'bot_api_calls': fake.calls,
+        'search_cache': bot.search_cache.stats(),
+        'audio_cache': dict(bot.AUDIO_CACHE_STATS),
+        'prefetch': bot.prefetcher.summary(),
+        'outbound': bot.outbound.stats(),
+        'delivery': delivery_report(),
+        'startup': {key: round(value, 3) if isinstance(value, float) else value for key, value in bot.STARTUP.items()}
+    }
+    return report
+
+
+def print_report(report):
+    print(f"\n📊 {report['updates']} updates @ concurrency {report['concurrency']}: "
+          f"{report['updates_per_s']} updates/s ({report['elapsed_s']}s)\n")
+    print(f"{'handler':<10} {'count':>6} {'errors':>6} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for kind, stats in report['handlers'].items():
+        print(f"{kind:<10} {stats['count']:>6} {stats['errors']:>6} "
+              f"{stats['p50_ms']:>9} {stats['p99_ms']:>9} {stats['max_ms']:>9}")
+    loop = report['event_loop']
+    print(f"\n⏱️ event loop: max lag {loop['max_lag_ms']}ms, p99 lag {loop['p99_lag_ms']}ms, "
+          f"{loop['stalls']} stalls totalling {loop['stall_seconds']}s")
+    print(f"🗄️ search cache: {report['search_cache']}")
+    print(f"🎵 audio cache: {report['audio_cache']}")
+    print(f"🔮 prefetch: {report['prefetch']}")
+    print(f"🚦 outbound: {report['outbound']}")
+    print(f"🎧 delivery: {report['delivery']}")
+    print(f"🚀 startup: {report['startup']}\n")
+
+
+async def compare_modes(args):
+    """Serial download-only runs per audio mode, so FFmpeg CPU can be attributed per track."""
+    reports = {}
+    for mode in bot.AUDIO_MODES:
+        bot.AUDIO_MODE = mode
+        # Every mode starts with the same daily credits
+        await bot.credits_collection.delete_many({})
+        reports[mode] = await run_benchmark(args)
+    return {
+        'updates': args.updates,
+        'track_seconds': args.track_seconds,
+        'modes': {
+            mode: dict(delivery_report()[mode], p50_ms=report['handlers']['download']['p50_ms'])
+            for mode, report in reports.items()
+        }
+    }
+
+
+def print_comparison(comparison):
+    print(f"\n🎧 audio modes, {comparison['updates']} serial downloads of a "
+          f"{comparison['track_seconds']}s track each\n")
+    print(f"{'mode':<8} {'tracks':>6} {'python s':>9} {'ffmpeg s':>9} {'CPU-s/trk':>10} {'p50 ms':>9}")
+    for mode, row in comparison['modes'].items():
+        cells = [row['python_cpu_s'], row['ffmpeg_cpu_s'], row['cpu_s_per_track']]
+        python_cpu, ffmpeg_cpu, total = ("-" if value is None else value for value in cells)
+        print(f"{mode:<8} {row['tracks']:>6} {python_cpu:>9} {ffmpeg_cpu:>9} {total:>10} {row['p50_ms']:>9}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the music bot")
+    parser.add_argument("--updates", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--mix", default="search=4,download=4,start=1,verify=1",
+                        help="update kinds and weights")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=50, help="distinct search queries")
+    parser.add_argument("--videos", type=int, default=50, help="distinct video ids")
+    parser.add_argument("--top-click-share", type=float, default=0.7,
+                        help="share of downloads that click a top-3 search result")
+    parser.add_argument("--search-delay", type=float, default=0.2)
+    parser.add_argument("--extract-delay", type=float, default=0.2, help="per-video info extraction")
+    parser.add_argument("--download-delay", type=float, default=0.5)
+    parser.add_argument("--playlist-size", type=int, default=12, help="tracks per fake playlist")
+    parser.add_argument("--mode", choices=bot.AUDIO_MODES, default="mp3")
+    parser.add_argument("--fixture-dir", help="directory with track.mp3 / track.m4a / track.jpg")
+    parser.add_argument("--ffmpeg", action="store_true",
+                        help="post-process downloads with the real FFmpeg (needs ffmpeg on PATH)")
+    parser.add_argument("--track-seconds", type=int, default=5, help="length of the synthesized m4a fixture")
+    parser.add_argument("--compare-modes", action="store_true",
+                        help="run serial downloads in every audio mode with --ffmpeg and compare CPU per track")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--ydl-setup", type=int, metavar="ROUNDS",
+                        help="only measure YoutubeDL setup cost per request, fresh vs pooled")
+    parser.add_argument("--shortener-check", action="store_true",
+                        help="only check shortener retries and circuit breaker against a scripted fake")
+    args = parser.parse_args()
+
+    if bot.MONGODB_URI.startswith("mongomock://") and importlib.util.find_spec("mongomock") is None:
+        raise SystemExit("bench.py needs mongomock: pip install -r requirements-dev.txt")
+
+    bot.LOG_LEVEL = "WARNING"
+    bot.startup()
+    bot.AUDIO_MODE = args.mode
+
+    if args.shortener_check:
+        results = asyncio.run(check_shortener())
+        for name, ok, detail in results:
+            print(f"{'✅' if ok else '❌'} {name}" + (f" ({detail})" if detail else ""))
+        failed = sum(1 for _, ok, _ in results if not ok)
+        print(f"\n{len(results) - failed}/{len(results)} shortener checks passed\n")
+        raise SystemExit(1 if failed else 0)
+
+    if args.ydl_setup:
+        setup = measure_ydl_setup(args.ydl_setup)
+        if args.json:
+            print(json.dumps(setup, indent=2))
+        else:
+            print(f"\n🔧 YoutubeDL setup per request ({args.ydl_setup} rounds)\n")
+            print(f"{'profile':18}{'fresh ms':>10}{'pooled ms':>11}")
+            for profile, row in setup.items():
+                print(f"{profile:18}{row['fresh_ms']:>10.3f}{row['pooled_ms']:>11.3f}")
+            print()
+        return
+
+    if args.ffmpeg or args.compare_modes:
+        FakeYoutubeDL.ffmpeg = shutil.which('ffmpeg')
+        if FakeYoutubeDL.ffmpeg is None:
+            raise SystemExit("--ffmpeg and --compare-modes need ffmpeg on PATH")
+
+    try:
+        if args.compare_modes:
+            # Child CPU is only attributed to downloads that didn't overlap
+            args.mix = "download=1"
+            args.concurrency = 1
+            comparison = asyncio.run(compare_modes(args))
+            if args.json:
+                print(json.dumps(comparison, indent=2))
+            else:
+                print_comparison(comparison)
+            return
+
+        report = asyncio.run(run_benchmark(args))
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print_report(report)
+    finally:
+        bot.search_pool.shutdown()
+        bot.download_pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()